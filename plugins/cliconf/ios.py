@@ -138,10 +138,9 @@ EXAMPLES = """
 
 import json
 import re
-import time
 
 from ansible.errors import AnsibleConnectionFailure
-from ansible.module_utils._text import to_text
+from ansible.module_utils._text import to_bytes, to_text
 from ansible.module_utils.common._collections_compat import Mapping
 from ansible.module_utils.six import iteritems
 from ansible_collections.ansible.netcommon.plugins.module_utils.network.common.config import (
@@ -155,9 +154,45 @@ from ansible_collections.ansible.netcommon.plugins.plugin_utils.cliconf_base imp
 )
 
 
+_RE_VERSION = re.compile(r"Version (\S+)")
+_RE_MODELS = (
+    re.compile(r"^[Cc]isco (.+) \(revision", re.M),
+    re.compile(r"^[Cc]isco (\S+).+bytes of .*memory", re.M),
+)
+_RE_UPTIME = re.compile(r"^(.+) uptime", re.M)
+_RE_IMAGE = re.compile(r'image file is "(.+)"')
+_RE_CONFIG_CTX = re.compile(r"config.*\)#")
+_RE_ARCH_OFF = re.compile(r"Archive.*not.enabled")
+_RE_NO_ROLLBACK = re.compile(r"%No Rollback Confirmed Change pending")
+_RE_CAND = re.compile(r"(?P<parent>^\w.*\n?)(?P<child>(?:\s+.*\n?)*)", re.M)
+_RE_BANNER = re.compile(r"^banner (\w+) \^C(.*?)\^C", re.M | re.S)
+
+_DEVICE_OPERATIONS = {
+    "supports_diff_replace": True,
+    "supports_commit": False,
+    "supports_rollback": False,
+    "supports_defaults": True,
+    "supports_onbox_diff": False,
+    "supports_commit_comment": False,
+    "supports_multiline_delimiter": True,
+    "supports_diff_match": True,
+    "supports_diff_ignore_lines": True,
+    "supports_generate_diff": True,
+    "supports_replace": False,
+}
+
+_OPTION_VALUES = {
+    "format": ["text"],
+    "diff_match": ["line", "strict", "exact", "none"],
+    "diff_replace": ["line", "block"],
+    "output": [],
+}
+
+
 class Cliconf(CliconfBase):
     def __init__(self, *args, **kwargs):
         self._device_info = {}
+        self._capabilities_json = None
         super(Cliconf, self).__init__(*args, **kwargs)
 
     @enable_mode
@@ -248,60 +283,66 @@ class Cliconf(CliconfBase):
                 % (diff_replace, ", ".join(option_values["diff_replace"])),
             )
 
-        cand_pattern = r"(?P<parent>^\w.*\n?)(?P<child>(?:\s+.*\n?)*)"
         # remove blank lines
-        candidate = re.sub("\n\n", "\n", candidate)
-        candidates = re.findall(cand_pattern, candidate, re.M)
+        candidate = "\n".join(line for line in candidate.split("\n") if line)
 
         diff["config_diff"] = ""
         diff["banner_diff"] = {}
 
         # exact plus src support. src can have multiple sections as candidates
         # e.g policy-map foo, policy-map bar, policy-map baz etc.
-        if candidates and not path and diff_match == "exact":
+        candidates = _RE_CAND.findall(candidate) if not path and diff_match == "exact" else []
+        if candidates:
+            running_obj = NetworkConfig(
+                indent=1,
+                contents=running,
+                ignore_lines=diff_ignore_lines,
+            )
             for _candidate in candidates:
                 path = [_candidate[0].strip()]
                 _candidate = "".join(_candidate)
                 _candidate_obj = NetworkConfig(indent=1)
                 _candidate_obj.load(_candidate)
 
-                running_obj = NetworkConfig(
-                    indent=1,
-                    contents=running,
-                    ignore_lines=diff_ignore_lines,
-                )
-
                 try:
                     have_lines = running_obj.get_block(path)
                 except ValueError:
                     have_lines = []
                 want_lines = _candidate_obj.get_block(path)
 
-                negates = ""
-                negated_parents = []
+                # ConfigLine equality compares parents plus text, match on that in sets
+                want_keys = set(line.line for line in want_lines)
+                have_keys = set(line.line for line in have_lines)
+
+                negates = []
+                negated_parents = set()
+                negates_seen = set()
                 for line in have_lines:
-                    if line not in want_lines:
-                        negates += "".join(
-                            f"{i}\n"
-                            for i in line.parents
-                            if i not in negates and i not in negated_parents
-                        )
+                    if line.line not in want_keys:
+                        parents = line.parents
+                        for i in parents:
+                            if i not in negates_seen and i not in negated_parents:
+                                negates.append(f"{i}\n")
+                                negates_seen.add(i)
 
                         if line.has_children:
-                            negated_parents.append(line.text)
+                            negated_parents.add(line.text)
 
-                        if not any(i in negated_parents for i in line.parents):
-                            negates += f"no {line}\n"
+                        if negated_parents.isdisjoint(parents):
+                            negates.append(f"no {line}\n")
 
-                diff["config_diff"] += negates
-
-                wants = ""
+                wants = []
+                wants_seen = set()
                 for line in want_lines:
-                    if line not in have_lines:
-                        wants += "".join(f"{i}\n" for i in line.parents if i not in wants)
-                        wants += f"{line}\n"
+                    if line.line not in have_keys:
+                        for i in line.parents:
+                            if i not in wants_seen:
+                                wants.append(f"{i}\n")
+                                wants_seen.add(i)
+                        wants.append(f"{line}\n")
+                        wants_seen.add(line.text)
 
-                diff["config_diff"] += wants
+                diff["config_diff"] += "".join(negates) + "".join(wants)
 
             diff["config_diff"] = diff["config_diff"].rstrip()
         else:
@@ -343,32 +384,30 @@ class Cliconf(CliconfBase):
         status of commit_confirm
         :return: None
         """
-        if self.get_option("commit_confirm_timeout") or self.get_option("commit_confirm_immediate"):
-            commit_timeout = (
-                self.get_option("commit_confirm_timeout")
-                if self.get_option("commit_confirm_timeout")
-                else 1
-            )  # add default timeout not default: 1 to support above or operation
+        commit_confirm_timeout = self.get_option("commit_confirm_timeout")
+        if commit_confirm_timeout or self.get_option("commit_confirm_immediate"):
+            # add default timeout not default: 1 to support above or operation
+            commit_timeout = commit_confirm_timeout if commit_confirm_timeout else 1
 
             persistent_command_timeout = self._connection.get_option("persistent_command_timeout")
-            # check archive state
-            archive_state = self.send_command("show archive")
-            rollback_state = self.send_command("show archive config rollback timer")
-
             if persistent_command_timeout > commit_timeout * 60:
                 raise ValueError(
                     "ansible_command_timeout can't be greater than commit_confirm_timeout "
                     "Please adjust and try again",
                 )
 
-            if re.search(r"Archive.*not.enabled", archive_state):
+            # check archive state
+            archive_state = self.send_command("show archive")
+            rollback_state = self.send_command("show archive config rollback timer")
+
+            if _RE_ARCH_OFF.search(archive_state):
                 raise ValueError(
                     "commit_confirm_immediate option set, but archiving "
                     "not enabled on device. "
                     "Please set up archiving and try again",
                 )
 
-            if not re.search(r"%No Rollback Confirmed Change pending", rollback_state):
+            if not _RE_NO_ROLLBACK.search(rollback_state):
                 raise ValueError(
                     "Existing rollback change already pending. "
                     "Please resolve by issuing 'configure confirm' "
@@ -391,14 +430,20 @@ class Cliconf(CliconfBase):
         commit_confirm = self.get_option("commit_confirm_immediate")
         if commit:
             self.configure()
-            for line in to_list(candidate):
-                if not isinstance(line, Mapping):
-                    line = {"command": line}
+            candidate = to_list(candidate)
+            if all(isinstance(line, str) for line in candidate):
+                # plain commands need no per line send options
+                requests = [cmd for cmd in candidate if cmd and cmd != "end" and cmd[0] != "!"]
+                results = [self.send_command(command=cmd) for cmd in requests]
+            else:
+                for line in candidate:
+                    if not isinstance(line, Mapping):
+                        line = {"command": line}
 
-                cmd = line["command"]
-                if cmd != "end" and cmd[0] != "!":
-                    results.append(self.send_command(**line))
-                    requests.append(cmd)
+                    cmd = line["command"]
+                    if cmd and cmd != "end" and cmd[0] != "!":
+                        results.append(self.send_command(**line))
+                        requests.append(cmd)
 
             self.send_command("end")
             if commit_confirm:
@@ -429,20 +474,17 @@ class Cliconf(CliconfBase):
         if commit:
             commands = ""
             self.send_command("config terminal")
-            time.sleep(0.1)
             # first item: macro command
             commands += candidate.pop(0) + "\n"
             multiline_delimiter = candidate.pop(-1)
             for line in candidate:
                 commands += " " + line + "\n"
             commands += multiline_delimiter + "\n"
-            obj = {"command": commands, "sendonly": True}
-            results.append(self.send_command(**obj))
+            # wait for the config prompt once the macro is closed
+            results.append(self.send_command(commands))
             requests.append(commands)
 
-            time.sleep(0.1)
             self.send_command("end", sendonly=True)
-            time.sleep(0.1)
             results.append(self.send_command("\n"))
             requests.append("\n")
 
@@ -477,8 +519,14 @@ class Cliconf(CliconfBase):
     def check_device_type(self):
         device_type = "L2"
         try:
-            self.get(command="show vlan")
-        except Exception:
+            self.get(command="show vlan brief")
+        except AnsibleConnectionFailure as e:
+            # devices without vlan support answer with an error response,
+            # anything else (timeouts, closed channel) is a connection problem
+            err = to_bytes(getattr(e, "err", to_text(e)), errors="surrogate_then_replace")
+            stderr_re = self._connection._get_terminal_std_re("terminal_stderr_re")
+            if not any(regex.search(err) for regex in stderr_re):
+                raise
             device_type = "L3"
         return device_type
 
@@ -491,26 +539,22 @@ class Cliconf(CliconfBase):
             self._update_cli_prompt_context(config_context=")#", exit_command="end")
             reply = self.get(command="show version")
             data = to_text(reply, errors="surrogate_or_strict").strip()
-            match = re.search(r"Version (\S+)", data)
+            match = _RE_VERSION.search(data)
             if match:
                 device_info["network_os_version"] = match.group(1).strip(",")
 
-            model_search_strs = [
-                r"^[Cc]isco (.+) \(revision",
-                r"^[Cc]isco (\S+).+bytes of .*memory",
-            ]
-            for item in model_search_strs:
-                match = re.search(item, data, re.M)
+            for item in _RE_MODELS:
+                match = item.search(data)
                 if match:
                     version = match.group(1).split(" ")
                     device_info["network_os_model"] = version[0]
                     break
 
-            match = re.search(r"^(.+) uptime", data, re.M)
+            match = _RE_UPTIME.search(data)
             if match:
                 device_info["network_os_hostname"] = match.group(1)
 
-            match = re.search(r'image file is "(.+)"', data)
+            match = _RE_IMAGE.search(data)
             if match:
                 device_info["network_os_image"] = match.group(1)
             device_info["network_os_type"] = self.check_device_type()
@@ -519,34 +563,25 @@ class Cliconf(CliconfBase):
         return self._device_info
 
     def get_device_operations(self):
-        return {
-            "supports_diff_replace": True,
-            "supports_commit": False,
-            "supports_rollback": False,
-            "supports_defaults": True,
-            "supports_onbox_diff": False,
-            "supports_commit_comment": False,
-            "supports_multiline_delimiter": True,
-            "supports_diff_match": True,
-            "supports_diff_ignore_lines": True,
-            "supports_generate_diff": True,
-            "supports_replace": False,
-        }
+        return _DEVICE_OPERATIONS
 
     def get_option_values(self):
-        return {
-            "format": ["text"],
-            "diff_match": ["line", "strict", "exact", "none"],
-            "diff_replace": ["line", "block"],
-            "output": [],
-        }
+        return _OPTION_VALUES
 
     def get_capabilities(self):
-        result = super(Cliconf, self).get_capabilities()
-        result["rpc"] += ["edit_banner", "get_diff", "run_commands", "get_defaults_flag"]
-        result["device_operations"] = self.get_device_operations()
-        result.update(self.get_option_values())
-        return json.dumps(result)
+        if self._capabilities_json is None:
+            result = super(Cliconf, self).get_capabilities()
+            # the base rpc list is shared by all instances, extend a copy of it
+            result["rpc"] = result["rpc"] + [
+                "edit_banner",
+                "get_diff",
+                "run_commands",
+                "get_defaults_flag",
+            ]
+            result["device_operations"] = self.get_device_operations()
+            result.update(self.get_option_values())
+            self._capabilities_json = json.dumps(result)
+        return self._capabilities_json
 
     def edit_banner(self, candidate=None, multiline_delimiter="@", commit=True):
         """
@@ -568,13 +603,16 @@ class Cliconf(CliconfBase):
             for key, value in iteritems(banners_obj):
                 key += " %s" % multiline_delimiter
                 self.send_command("config terminal", sendonly=True)
-                for cmd in [key, value, multiline_delimiter]:
+                for cmd in [key, value]:
                     obj = {"command": cmd, "sendonly": True}
                     results.append(self.send_command(**obj))
                     requests.append(cmd)
 
+                # wait for the config prompt once the banner is closed
+                results.append(self.send_command(multiline_delimiter))
+                requests.append(multiline_delimiter)
+
                 self.send_command("end", sendonly=True)
-                time.sleep(0.1)
                 results.append(self.send_command("\n"))
                 requests.append("\n")
 
@@ -616,15 +654,12 @@ class Cliconf(CliconfBase):
         out = self.get("show running-config ?")
         out = to_text(out, errors="surrogate_then_replace")
 
-        commands = set()
         for line in out.splitlines():
-            if line.strip():
-                commands.add(line.strip().split()[0])
+            tokens = line.split(None, 1)
+            if tokens and tokens[0] == "all":
+                return "all"
 
-        if "all" in commands:
-            return "all"
-        else:
-            return "full"
+        return "full"
 
     def set_cli_prompt_context(self):
         """
@@ -640,28 +675,27 @@ class Cliconf(CliconfBase):
                     " response window: %s" % self._connection._last_recv_window,
                 )
 
-            if re.search(r"config.*\)#", to_text(out, errors="surrogate_then_replace").strip()):
+            if _RE_CONFIG_CTX.search(to_text(out, errors="surrogate_then_replace").strip()):
                 self._connection.queue_message("vvvv", "wrong context, sending end to device")
                 self._connection.send_command("end")
 
     def _extract_banners(self, config):
         banners = {}
-        banner_cmds = re.findall(r"^banner (\w+)", config, re.M)
-        for cmd in banner_cmds:
-            regex = r"banner %s \^C(.+?)(?=\^C)" % cmd
-            match = re.search(regex, config, re.S)
-            if match:
-                key = "banner %s" % cmd
-                banners[key] = match.group(1).strip()
-
-        for cmd in banner_cmds:
-            regex = r"banner %s \^C(.+?)(?=\^C)" % cmd
-            match = re.search(regex, config, re.S)
-            if match:
-                config = config.replace(str(match.group(1)), "")
-
-        config = re.sub(r"banner \w+ \^C\^C", "!! banner removed", config)
-        return config, banners
+        if "banner " not in config:
+            return config, banners
+
+        parts = []
+        last_end = 0
+        for match in _RE_BANNER.finditer(config):
+            if match.group(2):
+                banners["banner %s" % match.group(1)] = match.group(2).strip()
+            start, end = match.span()
+            parts.append(config[last_end:start])
+            parts.append("!! banner removed")
+            last_end = end
+
+        parts.append(config[last_end:])
+        return "".join(parts), banners
 
     def _diff_banners(self, want, have):
         candidate = {}
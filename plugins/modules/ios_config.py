@@ -479,7 +479,8 @@ def main():
         replace = module.params["replace"]
         path = module.params["parents"]
         candidate = get_candidate_config(module)
-        running = get_running_config(module, contents, flags=flags)
+        # match none pushes the candidate as is, the running config is not needed
+        running = get_running_config(module, contents, flags=flags) if match != "none" else None
         try:
             response = connection.get_diff(
                 candidate=candidate,
@@ -238,6 +238,16 @@ class TestIosConfigModule(TestIosModule):
         )
         self.execute_module(changed=True, commands=lines)
 
+    def test_ios_config_match_none_skips_running_config(self):
+        lines = ["hostname router"]
+        set_module_args(dict(lines=lines, match="none"))
+        self.conn.get_diff = MagicMock(
+            return_value=self.cliconf_obj.get_diff("\n".join(lines), diff_match="none"),
+        )
+        self.execute_module(changed=True, commands=lines)
+        self.get_config.assert_not_called()
+        self.assertIsNone(self.conn.get_diff.call_args.kwargs["running"])
+
     def test_ios_config_match_none2(self):
         lines = ["ip address 1.2.3.4 255.255.255.0", "description test string"]
         parents = ["interface GigabitEthernet0/0"]
@@ -22,6 +22,7 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import json
+import re
 
 from os import path
 
@@ -33,9 +34,11 @@ except ImportError:
 
 from unittest import TestCase
 
+from ansible.errors import AnsibleConnectionFailure
 from ansible.module_utils._text import to_bytes
 
 from ansible_collections.cisco.ios.plugins.cliconf import ios
+from ansible_collections.cisco.ios.plugins.terminal.ios import TerminalModule
 
 
 b_FIXTURE_DIR = b"%s/fixtures/ios" % (
@@ -138,3 +141,332 @@ class TestPluginCLIConfIOS(TestCase):
             ],
         }
         self.assertEqual(sorted(mock_capabilities), sorted(capabilities))
+
+    def _set_options(self, **options):
+        self._mock_connection.get_prompt.return_value = b"an-csr-01#"
+        self._cliconf.get_option = MagicMock(side_effect=lambda opt: options.get(opt))
+
+    def _sent_commands(self):
+        return [call.kwargs["command"] for call in self._mock_connection.send.call_args_list]
+
+    def test_edit_config(self):
+        """Test edit_config sends each configuration line"""
+        self._set_options()
+        resp = self._cliconf.edit_config(["hostname R1", "!", "ip domain-name test.com", "end"])
+
+        self.assertEqual(resp["request"], ["hostname R1", "ip domain-name test.com"])
+        self.assertEqual(len(resp["response"]), 2)
+        self.assertEqual(
+            self._sent_commands(),
+            [b"configure terminal", b"hostname R1", b"ip domain-name test.com", b"end"],
+        )
+
+    def test_edit_config_mapping(self):
+        """Test edit_config passes send options of each line"""
+        self._set_options()
+        candidate = [
+            "interface GigabitEthernet1",
+            {"command": "no username admin", "prompt": "confirm", "answer": "y"},
+            "!",
+        ]
+        resp = self._cliconf.edit_config(candidate)
+
+        self.assertEqual(resp["request"], ["interface GigabitEthernet1", "no username admin"])
+        self.assertEqual(len(resp["response"]), 2)
+        self.assertEqual(
+            self._sent_commands(),
+            [b"configure terminal", b"interface GigabitEthernet1", b"no username admin", b"end"],
+        )
+        self.assertEqual(self._mock_connection.send.call_args_list[2].kwargs["answer"], b"y")
+
+    def test_edit_config_empty_line(self):
+        """Test edit_config skips empty lines in the candidate"""
+        self._set_options()
+        resp = self._cliconf.edit_config(["hostname R1", ""])
+
+        self.assertEqual(resp["request"], ["hostname R1"])
+        self.assertEqual(self._sent_commands(), [b"configure terminal", b"hostname R1", b"end"])
+
+        self._mock_connection.send.reset_mock()
+        resp = self._cliconf.edit_config([""])
+
+        self.assertEqual(resp["request"], [])
+        self.assertEqual(self._sent_commands(), [b"configure terminal", b"end"])
+
+    def test_extract_banners(self):
+        """Test _extract_banners"""
+        config = (
+            "hostname R1\n"
+            "banner exec ^C\nexec banner\n^C\n"
+            "banner motd ^C\nmotd banner\nsecond line\n^C\n"
+            "interface GigabitEthernet1\n description test\n"
+        )
+        config, banners = self._cliconf._extract_banners(config)
+
+        self.assertEqual(
+            config,
+            "hostname R1\n"
+            "!! banner removed\n"
+            "!! banner removed\n"
+            "interface GigabitEthernet1\n description test\n",
+        )
+        self.assertEqual(
+            banners,
+            {"banner exec": "exec banner", "banner motd": "motd banner\nsecond line"},
+        )
+
+    def test_extract_banners_duplicate_name(self):
+        """Test _extract_banners removes every block of a repeated banner"""
+        config = "hostname R1\nbanner motd ^C\nA\n^C\nbanner motd ^C\nB\n^C\nline vty 0 4\n"
+        config, banners = self._cliconf._extract_banners(config)
+
+        self.assertEqual(
+            config,
+            "hostname R1\n!! banner removed\n!! banner removed\nline vty 0 4\n",
+        )
+        self.assertEqual(banners, {"banner motd": "B"})
+
+    def test_get_diff_match_exact_src(self):
+        """Test get_diff with match exact and multiple candidate sections"""
+        running = (
+            "hostname R1\n"
+            "policy-map foo\n class bar\n  police 1000\n  set dscp af11\n class baz\n"
+            "interface GigabitEthernet1\n description old\n shutdown\n"
+        )
+        candidate = (
+            "policy-map foo\n class bar\n  police 2000\n  set dscp af12\n"
+            "interface GigabitEthernet1\n description new\n shutdown\n"
+            "interface GigabitEthernet10\n description ten\n"
+        )
+        diff = self._cliconf.get_diff(candidate, running, diff_match="exact")
+
+        self.assertEqual(
+            diff["config_diff"].splitlines(),
+            [
+                "policy-map foo",
+                "class bar",
+                "no   police 1000",
+                "no   set dscp af11",
+                "no  class baz",
+                "policy-map foo",
+                "class bar",
+                "  police 2000",
+                "  set dscp af12",
+                "interface GigabitEthernet1",
+                "no  description old",
+                "interface GigabitEthernet1",
+                " description new",
+                "interface GigabitEthernet10",
+                " description ten",
+            ],
+        )
+
+    def test_get_diff_match_exact_src_similar_parents(self):
+        """Test get_diff with match exact keeps parents that prefix another line"""
+        running = "policy-map foo\n class bar\n  police 1000\n"
+        candidate = (
+            "policy-map foo\n class barbaz\n  police 500\n"
+            " class bar\n  police 1000\n  set dscp af11\n"
+        )
+        diff = self._cliconf.get_diff(candidate, running, diff_match="exact")
+
+        self.assertEqual(
+            diff["config_diff"].splitlines(),
+            ["policy-map foo", " class barbaz", "  police 500", "class bar", "  set dscp af11"],
+        )
+
+    def test_edit_config_commit_confirm(self):
+        """Test commit confirm archive checks are sent one at a time"""
+        self._set_options(commit_confirm_immediate=True)
+        self._mock_connection.get_option.return_value = 30
+        self._mock_connection.send.side_effect = None
+        self._mock_connection.send.return_value = (
+            "Archive feature enabled\n%No Rollback Confirmed Change pending"
+        )
+        self._cliconf.edit_config(["hostname R1"])
+
+        self.assertEqual(
+            self._sent_commands(),
+            [
+                b"show archive",
+                b"show archive config rollback timer",
+                b"configure terminal revert timer 1",
+                b"hostname R1",
+                b"end",
+                b"configure confirm",
+            ],
+        )
+
+    def test_check_device_type(self):
+        """Test check_device_type treats error responses as L3"""
+        responses = [
+            "show vlan brief\r\n% Invalid input detected at '^' marker.",
+            "% Error: VLAN database not supported",
+            "ERROR: command not available",
+            "show vlan brief\r\nvlan database not found",
+            "Command Rejected: not supported on this platform",
+            "Command authorization failed.",
+        ]
+        self._mock_connection._get_terminal_std_re.return_value = TerminalModule.terminal_stderr_re
+        for response in responses:
+            with self.subTest(response=response):
+                self._mock_connection.send.side_effect = AnsibleConnectionFailure(response)
+                self.assertEqual(self._cliconf.check_device_type(), "L3")
+
+    def test_check_device_type_custom_stderr_re(self):
+        """Test check_device_type uses the connection terminal_stderr_re"""
+        self._mock_connection._get_terminal_std_re.return_value = [
+            re.compile(rb"VLAN feature unavailable"),
+        ]
+        self._mock_connection.send.side_effect = AnsibleConnectionFailure(
+            "VLAN feature unavailable",
+        )
+        self.assertEqual(self._cliconf.check_device_type(), "L3")
+        self._mock_connection._get_terminal_std_re.assert_called_with("terminal_stderr_re")
+
+    def test_check_device_type_connection_failure(self):
+        """Test check_device_type does not hide connection failures"""
+
+        def _send(*args, **kwargs):
+            raise AnsibleConnectionFailure("timeout value 30 seconds reached")
+
+        self._mock_connection._get_terminal_std_re.return_value = TerminalModule.terminal_stderr_re
+        self._mock_connection.send.side_effect = _send
+        self.assertRaises(AnsibleConnectionFailure, self._cliconf.check_device_type)
+
+    def test_get_defaults_flag(self):
+        """Test get_defaults_flag"""
+        self._mock_connection.send.side_effect = None
+        self._mock_connection.send.return_value = (
+            "  all             Configuration with defaults\n"
+            "  brief           configuration without certificate data\n"
+        )
+        self.assertEqual(self._cliconf.get_defaults_flag(), "all")
+
+        self._mock_connection.send.return_value = (
+            "  brief           configuration without certificate data\n"
+            "  full            full configuration\n"
+        )
+        self.assertEqual(self._cliconf.get_defaults_flag(), "full")
+
+    def test_edit_banner(self):
+        """Test edit_banner waits for the prompt once the banner is closed"""
+        resp = self._cliconf.edit_banner(json.dumps({"banner motd": "this is a banner"}))
+
+        self.assertEqual(
+            resp["request"],
+            ["banner motd @", "this is a banner", "@", "\n"],
+        )
+        self.assertEqual(
+            [
+                (call.kwargs["command"], call.kwargs["sendonly"])
+                for call in self._mock_connection.send.call_args_list
+            ],
+            [
+                (b"config terminal", True),
+                (b"banner motd @", True),
+                (b"this is a banner", True),
+                (b"@", False),
+                (b"end", True),
+                (b"\n", False),
+            ],
+        )
+
+    def test_edit_macro(self):
+        """Test edit_macro waits for the prompt once the macro is closed"""
+        resp = self._cliconf.edit_macro(["macro name test", "switchport mode access", "@"])
+
+        commands = "macro name test\n switchport mode access\n@\n"
+        self.assertEqual(resp["request"], [commands, "\n"])
+        self.assertEqual(resp["response"], [to_bytes(commands), b"\n"])
+        self.assertEqual(
+            [
+                (call.kwargs["command"], call.kwargs["sendonly"])
+                for call in self._mock_connection.send.call_args_list
+            ],
+            [
+                (b"config terminal", False),
+                (to_bytes(commands), False),
+                (b"end", True),
+                (b"\n", False),
+            ],
+        )
+
+    def test_get_capabilities_cached(self):
+        """Test get_capabilities is only built once per connection"""
+        capabilities = self._cliconf.get_capabilities()
+        self._cliconf._device_info = {}
+
+        self.assertEqual(self._cliconf.get_capabilities(), capabilities)
+        self.assertEqual(self._cliconf._device_info, {})
+
+        mock_connection = MagicMock()
+        mock_connection.send.side_effect = _connection_side_effect
+        self.assertEqual(ios.Cliconf(mock_connection).get_capabilities(), capabilities)
+
+    def test_get_diff_banners(self):
+        """Test get_diff reports changed banners separately from the config"""
+        running = (
+            "hostname R1\n"
+            "banner exec ^C\nsame exec\n^C\n"
+            "banner motd ^C\nold motd\n^C\n"
+            "line vty 0 4\n"
+        )
+        candidate = (
+            "hostname R2\n"
+            "banner exec ^C\nsame exec\n^C\n"
+            "banner motd ^C\nnew motd\n^C\n"
+            "line vty 0 4\n"
+        )
+        diff = self._cliconf.get_diff(candidate, running)
+
+        self.assertEqual(diff["config_diff"], "hostname R2")
+        self.assertEqual(diff["banner_diff"], {"banner motd": "new motd"})
+
+    def test_extract_banners_keeps_matching_text(self):
+        """Test _extract_banners only removes the banner block itself"""
+        config = (
+            "interface GigabitEthernet1\n description Authorized access only\n"
+            "banner motd ^CAuthorized access only^C\n"
+        )
+        config, banners = self._cliconf._extract_banners(config)
+
+        self.assertEqual(
+            config,
+            "interface GigabitEthernet1\n description Authorized access only\n!! banner removed\n",
+        )
+        self.assertEqual(banners, {"banner motd": "Authorized access only"})
+
+    def test_get_diff_match_exact_src_blank_lines(self):
+        """Test get_diff with match exact ignores runs of blank lines in the candidate"""
+        candidate = "interface GigabitEthernet1\n\n\n description test\n\n\ninterface GigabitEthernet2\n shutdown\n"
+        diff = self._cliconf.get_diff(candidate, "interface GigabitEthernet1\n", diff_match="exact")
+
+        self.assertEqual(
+            diff["config_diff"].splitlines(),
+            [
+                "interface GigabitEthernet1",
+                " description test",
+                "interface GigabitEthernet2",
+                " shutdown",
+            ],
+        )
+
+    def test_get_diff_keeps_control_characters(self):
+        """Test get_diff only splits the candidate on newlines when removing blank lines"""
+        candidate = "hostname R1\r\n\nalias exec test foo\x0cbar\n"
+        diff = self._cliconf.get_diff(candidate, "hostname R1\n")
+
+        self.assertEqual(diff["config_diff"], "alias exec test foo\x0cbar")
+
+    def test_get_diff_banner_whitespace_line(self):
+        """Test get_diff keeps whitespace only lines in banners"""
+        config = (
+            "hostname R1\n"
+            "banner motd ^C\n*** WARNING ***\n   \nAuthorized only\n^C\n"
+            "line vty 0 4\n"
+        )
+        diff = self._cliconf.get_diff(config, config)
+
+        self.assertEqual(diff["config_diff"], "")
+        self.assertEqual(diff["banner_diff"], {})